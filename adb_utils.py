@@ -2,9 +2,18 @@
 
 """Utility helpers for interacting with the game on macOS."""
 
+import functools
+import math
+import threading
+import time
+
+import cv2
+import numpy as np
 import psutil
 from PIL import Image
 
+from debounce import now_ms
+
 # Optional Quartz import for background clicks on macOS
 try:  # Quartz is only available on macOS with PyObjC installed
     import Quartz
@@ -22,12 +31,78 @@ except Exception as e:  # noqa: PIE786 - broad except ok for optional dep
     _PYAUTO_ERROR = e
     _HAS_PYAUTOGUI = False
 
-# Screen scale factor for HiDPI displays (e.g. Retina)
-_SCREEN_SCALE: float = 1.0
+try:  # AppKit lists running GUI apps without psutil's per-process syscalls
+    from AppKit import NSWorkspace  # type: ignore
+    _HAS_APPKIT = True
+except Exception as e:  # noqa: PIE786 - broad except ok for optional dep
+    NSWorkspace = None
+    _APPKIT_ERROR = e
+    _HAS_APPKIT = False
 
+try:  # mss grabs straight into memory (no screencapture subprocess / PNG)
+    import mss  # type: ignore
+    _HAS_MSS = True
+except Exception as e:  # noqa: PIE786 - broad except ok for optional dep
+    mss = None
+    _MSS_ERROR = e
+    _HAS_MSS = False
 
-def _get_app_pid() -> int | None:
-    """Return the process ID of the game if running, otherwise ``None``."""
+
+@functools.cache
+def _detect_scale() -> float:
+    """Return the HiDPI scale (screenshot pixels per screen point).
+
+    Measured once and cached; call :func:`refresh_scale` after a display
+    change.
+    """
+    if _HAS_QUARTZ:
+        mode = Quartz.CGDisplayCopyDisplayMode(Quartz.CGMainDisplayID())
+        if mode is not None and Quartz.CGDisplayModeGetWidth(mode):
+            return (Quartz.CGDisplayModeGetPixelWidth(mode)
+                    / Quartz.CGDisplayModeGetWidth(mode))
+    if _HAS_PYAUTOGUI:
+        try:
+            img = pyautogui.screenshot()  # type: ignore[arg-type]
+            w, h = pyautogui.size()  # type: ignore[attr-defined]
+            if w and h:
+                return (img.width / w + img.height / h) / 2
+        except Exception:
+            pass
+    return 1.0
+
+
+def refresh_scale() -> float:
+    """Re-measure the HiDPI scale, e.g. after switching displays."""
+    _detect_scale.cache_clear()
+    return _detect_scale()
+
+
+# Cached game process so taps don't rescan the whole process table
+_CACHED_PID: int | None = None
+_CACHED_PROC: psutil.Process | None = None
+_PID_CHECKED_AT: float = 0.0
+_PID_TTL = 1.0  # seconds a validated PID is trusted without a syscall
+_MISSED_AT: float | None = None
+_MISS_TTL = 5.0  # seconds a failed lookup is trusted before scanning again
+
+
+def _find_app_pid() -> int | None:
+    """Scan for the game: running apps via AppKit, then the process table.
+
+    ``runningApplications`` only refreshes while a main run loop spins,
+    which the CLI never does: a miss falls through to psutil (bounded by
+    ``_MISS_TTL``), and a stale hit whose PID has since exited is skipped
+    the same way.
+    """
+    if _HAS_APPKIT:
+        for app in NSWorkspace.sharedWorkspace().runningApplications():
+            name = (app.localizedName() or '').lower()
+            url = app.bundleURL()
+            path = (url.path() if url is not None else '').lower()
+            if 'tower' in name or 'tower' in path:
+                pid = int(app.processIdentifier())
+                if psutil.pid_exists(pid):
+                    return pid
     for proc in psutil.process_iter(['pid', 'name', 'exe', 'cmdline']):
         name = (proc.info.get('name') or '').lower()
         exe = (proc.info.get('exe') or '').lower()
@@ -37,54 +112,348 @@ def _get_app_pid() -> int | None:
     return None
 
 
+def _get_app_pid() -> int | None:
+    """Return the process ID of the game if running, otherwise ``None``.
+
+    The last match is cached and revalidated with a single ``is_running()``
+    call at most every ``_PID_TTL`` seconds; a miss is remembered for
+    ``_MISS_TTL`` seconds. Only then does :func:`_find_app_pid` scan again.
+    """
+    global _CACHED_PID, _CACHED_PROC, _PID_CHECKED_AT, _MISSED_AT
+    now = time.monotonic()
+    if _CACHED_PROC is not None:
+        if now - _PID_CHECKED_AT < _PID_TTL:
+            return _CACHED_PID
+        try:
+            if _CACHED_PROC.is_running():
+                _PID_CHECKED_AT = now
+                return _CACHED_PID
+        except psutil.Error:
+            pass
+        _CACHED_PID = _CACHED_PROC = None
+    elif _MISSED_AT is not None and now - _MISSED_AT < _MISS_TTL:
+        return None
+
+    pid = _find_app_pid()
+    if pid is not None:
+        try:
+            _CACHED_PID, _CACHED_PROC = pid, psutil.Process(pid)
+            _PID_CHECKED_AT, _MISSED_AT = now, None
+            return _CACHED_PID
+        except psutil.Error:
+            pass
+    _MISSED_AT = now
+    return None
+
+
 def ensure_app_running() -> bool:
-    """Return ``True`` if the game process is running on macOS."""
+    """Return ``True`` if the game process is running on macOS.
+
+    Also primes the PID cache used by :func:`mac_tap`.
+    """
     return _get_app_pid() is not None
 
 
-def mac_screencap() -> Image.Image:
-    """Capture the current screen and return a PIL Image.
+def _cgimage_to_pil(cg) -> Image.Image:
+    """Wrap a Quartz ``CGImage`` (32-bit BGRA) as an RGB PIL Image."""
+    w = Quartz.CGImageGetWidth(cg)
+    h = Quartz.CGImageGetHeight(cg)
+    stride = Quartz.CGImageGetBytesPerRow(cg)
+    data = Quartz.CGDataProviderCopyData(Quartz.CGImageGetDataProvider(cg))
+    return Image.frombuffer("RGB", (w, h), bytes(data), "raw", "BGRX", stride, 1)
 
-    Falls back to a 1×1 blank image if ``pyautogui`` is unavailable.
-    """
-    if _HAS_PYAUTOGUI:
-        img = pyautogui.screenshot()  # type: ignore[arg-type]
-        # Update screen scale on each capture in case of display changes
-        try:
-            w, h = pyautogui.size()  # type: ignore[attr-defined]
-            global _SCREEN_SCALE
-            if w and h:
-                scale_x = img.width / w
-                scale_y = img.height / h
-                scale = (scale_x + scale_y) / 2
-                if scale > 0:
-                    _SCREEN_SCALE = scale
-        except Exception:
-            pass
-        return img
+
+def _grab_quartz_cg(rect):
+    return Quartz.CGWindowListCreateImage(
+        rect,
+        Quartz.kCGWindowListOptionOnScreenOnly,
+        Quartz.kCGNullWindowID,
+        Quartz.kCGWindowImageDefault,
+    )
+
+
+def _grab_quartz(rect) -> Image.Image | None:
+    cg = _grab_quartz_cg(rect)
+    return None if cg is None else _cgimage_to_pil(cg)
+
+
+def _bgra_to_gray(buf, w: int, h: int, stride: int) -> np.ndarray:
+    """Luma of a raw 32-bit BGRA buffer, read in place (no RGB image)."""
+    bgra = np.frombuffer(buf, np.uint8).reshape(h, stride // 4, 4)[:, :w]
+    return cv2.cvtColor(bgra, cv2.COLOR_BGRA2GRAY)
+
+
+def _mac_screencap_quartz() -> Image.Image:
+    img = _grab_quartz(Quartz.CGDisplayBounds(Quartz.CGMainDisplayID()))
+    return img if img is not None else _mac_screencap_fallback()
+
+
+# mss handles must not be shared between threads; the GUI and the capture
+# thread each lazily get their own
+_MSS_LOCAL = threading.local()
+
+
+def _mss():
+    """This thread's mss handle, created on first use."""
+    sct = getattr(_MSS_LOCAL, "sct", None)
+    if sct is None:
+        sct = _MSS_LOCAL.sct = mss.mss()
+    return sct
+
+
+def _mac_screencap_mss() -> Image.Image:
+    sct = _mss()
+    raw = sct.grab(sct.monitors[1])
+    return Image.frombuffer("RGB", raw.size, raw.bgra, "raw", "BGRX", 0, 1)
+
+
+def _mac_screencap_pyautogui() -> Image.Image:
+    return pyautogui.screenshot()  # type: ignore[arg-type]
+
+
+def _mac_screencap_blank() -> Image.Image:
     # Provide a dummy image with a typical screen size to keep cv2 happy
     return Image.new("RGB", (1280, 720))
 
 
-def mac_tap(x: int, y: int):
-    """Simulate a tap/click at ``(x, y)`` without moving the visible cursor."""
-    scale = _SCREEN_SCALE or 1.0
+_mac_screencap_fallback = (
+    _mac_screencap_mss if _HAS_MSS
+    else _mac_screencap_pyautogui if _HAS_PYAUTOGUI
+    else _mac_screencap_blank
+)
+
+# Capture the current screen as a PIL Image. With Quartz or mss the main
+# display is read back as raw BGRA (no screencapture subprocess / PNG
+# decode); otherwise pyautogui, then a blank image. Backends are bound once
+# here so the hot path carries no _HAS_* checks.
+mac_screencap = (
+    _mac_screencap_quartz if _HAS_QUARTZ else _mac_screencap_fallback
+)
+
+
+def _enclosing_points(x: int, y: int, w: int, h: int):
+    """Point rectangle ``(left, top, width, height)`` enclosing pixel rect
+    (x, y, w, h). Rounding the edges outward and slicing the grab with
+    :func:`_slice_window` keeps the pixels exact; rounding each edge and
+    resizing would shift and blend them.
+    """
+    scale = _detect_scale()
+    left, top = math.floor(x / scale), math.floor(y / scale)
+    right, bottom = math.ceil((x + w) / scale), math.ceil((y + h) / scale)
+    return left, top, max(right - left, 1), max(bottom - top, 1)
+
+
+def _slice_window(gray: np.ndarray, pts, x: int, y: int, w: int, h: int) -> np.ndarray:
+    """Pixel window (x, y, w, h) of a grab of the point rect ``pts``."""
+    left, top, pw, ph = pts
+    # Pixels per point as actually delivered, not as assumed
+    sx = gray.shape[1] / pw
+    sy = gray.shape[0] / ph
+    dx, dy = round(x - left * sx), round(y - top * sy)
+    return gray[dy:dy + h, dx:dx + w]
+
+
+def _mac_screencap_rect_gray_quartz(x: int, y: int, w: int, h: int) -> np.ndarray:
+    pts = _enclosing_points(x, y, w, h)
+    cg = _grab_quartz_cg(Quartz.CGRectMake(*pts))
+    if cg is None:
+        return _mac_screencap_rect_gray_fallback(x, y, w, h)
+    data = Quartz.CGDataProviderCopyData(Quartz.CGImageGetDataProvider(cg))
+    gray = _bgra_to_gray(bytes(data), Quartz.CGImageGetWidth(cg),
+                         Quartz.CGImageGetHeight(cg), Quartz.CGImageGetBytesPerRow(cg))
+    return _slice_window(gray, pts, x, y, w, h)
+
+
+def _mac_screencap_rect_gray_mss(x: int, y: int, w: int, h: int) -> np.ndarray:
+    pts = _enclosing_points(x, y, w, h)
+    left, top, pw, ph = pts
+    raw = _mss().grab({"left": left, "top": top, "width": pw, "height": ph})
+    gray = _bgra_to_gray(raw.bgra, raw.width, raw.height, raw.width * 4)
+    return _slice_window(gray, pts, x, y, w, h)
+
+
+def _mac_screencap_rect_gray_crop(x: int, y: int, w: int, h: int) -> np.ndarray:
+    img = _mac_screencap_fallback().crop((x, y, x + w, y + h))
+    # PIL's "L" uses the same ITU-R 601 luma weights as cv2's RGB2GRAY;
+    # np.array (not asarray) so the result is writable
+    return np.array(img.convert("L"))
+
+
+# Non-Quartz path, also used when a Quartz grab comes back empty
+_mac_screencap_rect_gray_fallback = (
+    _mac_screencap_rect_gray_mss if _HAS_MSS else _mac_screencap_rect_gray_crop
+)
+
+# Capture only the (x, y, w, h) rectangle of the screen, in screenshot pixels
+# like the regions in regions.json, as a uint8 luma ndarray. Quartz and mss
+# buffers go straight from BGRA to gray, never building the RGB image that
+# every consumer would only convert again; otherwise a full grab is cropped.
+mac_screencap_rect_gray = (
+    _mac_screencap_rect_gray_quartz if _HAS_QUARTZ
+    else _mac_screencap_rect_gray_fallback
+)
+
+
+# One reusable event source for synthetic clicks. A zero suppression interval
+# stops macOS from throttling events posted back to back.
+_EVT_SRC = None
+if _HAS_QUARTZ:
+    _EVT_SRC = Quartz.CGEventSourceCreate(Quartz.kCGEventSourceStateHIDSystemState)
+    Quartz.CGEventSourceSetLocalEventsSuppressionInterval(_EVT_SRC, 0.0)
+
+
+def _mac_tap_quartz(x: int, y: int):
+    pid = _get_app_pid()
+    if pid is None:
+        return _mac_tap_fallback(x, y)
+    scale = _detect_scale()
     xs, ys = int(x / scale), int(y / scale)
-    if _HAS_QUARTZ:
-        pid = _get_app_pid()
-        if pid is not None:
-            for ev in (Quartz.kCGEventLeftMouseDown, Quartz.kCGEventLeftMouseUp):
-                event = Quartz.CGEventCreateMouseEvent(
-                    None, ev, (xs, ys), Quartz.kCGMouseButtonLeft
-                )
-                Quartz.CGEventSetIntegerValueField(
-                    event, Quartz.kCGEventTargetUnixProcessID, pid
-                )
-                Quartz.CGEventPost(Quartz.kCGHIDEventTap, event)
-                Quartz.CFRelease(event)
+    for ev in (Quartz.kCGEventLeftMouseDown, Quartz.kCGEventLeftMouseUp):
+        event = Quartz.CGEventCreateMouseEvent(
+            _EVT_SRC, ev, (xs, ys), Quartz.kCGMouseButtonLeft
+        )
+        Quartz.CGEventSetIntegerValueField(
+            event, Quartz.kCGEventTargetUnixProcessID, pid
+        )
+        Quartz.CGEventPost(Quartz.kCGHIDEventTap, event)
+        Quartz.CFRelease(event)
+
+
+def _mac_tap_pyautogui(x: int, y: int):
+    scale = _detect_scale()
+    pyautogui.click(int(x / scale), int(y / scale))  # type: ignore[arg-type]
+
+
+def _noop_tap(x: int, y: int):
+    pass
+
+
+_mac_tap_fallback = _mac_tap_pyautogui if _HAS_PYAUTOGUI else _noop_tap
+
+# Simulate a tap/click at (x, y) without moving the visible cursor.
+mac_tap = _mac_tap_quartz if _HAS_QUARTZ else _mac_tap_fallback
+
+
+Region = tuple[int, int, int, int]
+
+# FourCC 'BGRA' pixel format for CGDisplayStream
+_BGRA = 0x42475241
+
+
+def _intersects(a: Region, b: Region) -> bool:
+    return (a[0] < b[0] + b[2] and b[0] < a[0] + a[2]
+            and a[1] < b[1] + b[3] and b[1] < a[1] + a[3])
+
+
+class DirtyTracker:
+    """Track when each watched group of screen regions last changed.
+
+    A ``CGDisplayStream`` reports the dirty rectangles of each new frame on a
+    background run loop; any rect overlapping a watched region stamps its key
+    with the current :func:`debounce.now_ms` time. Without Quartz (or if the
+    stream cannot start) every key reads as changed "now", so callers behave
+    exactly as without a tracker.
+    """
+
+    def __init__(self, min_frame_time: float = 0.05):
+        self._min_frame_time = min_frame_time
+        self._lock = threading.Lock()
+        self._watch: dict[str, list[Region]] = {}
+        self._changed: dict[str, int] = {}
+        self._stream = None
+        self._runloop = None
+        self._thr: threading.Thread | None = None
+
+    @property
+    def active(self) -> bool:
+        return self._stream is not None
+
+    def watch(self, regions: dict[str, list[Region]]):
+        """Set the watched regions (screenshot pixels); all start changed."""
+        now = now_ms()
+        with self._lock:
+            self._watch = {k: list(v) for k, v in regions.items()}
+            self._changed = dict.fromkeys(self._watch, now)
+
+    def changed_at(self, key: str) -> int:
+        """``now_ms()`` time of the last change seen in ``key``'s regions."""
+        if not self.active:
+            return now_ms()
+        return self._changed.get(key, now_ms())
+
+    def mark(self, *keys: str):
+        """Stamp keys (default: all) as changed now, e.g. after a tap."""
+        now = now_ms()
+        with self._lock:
+            for key in keys or list(self._watch):
+                self._changed[key] = now
+
+    def start(self) -> bool:
+        """Start the display stream; returns ``False`` if unavailable."""
+        if not _HAS_QUARTZ or self.active:
+            return self.active
+        ready = threading.Event()
+        self._thr = threading.Thread(target=self._run, args=(ready,), daemon=True)
+        self._thr.start()
+        ready.wait(2.0)
+        return self.active
+
+    def stop(self):
+        if self._stream is not None:
+            Quartz.CGDisplayStreamStop(self._stream)
+        if self._runloop is not None:
+            Quartz.CFRunLoopStop(self._runloop)
+        if self._thr is not None:
+            self._thr.join(1.0)
+        self._stream = self._runloop = self._thr = None
+
+    def _run(self, ready: threading.Event):
+        try:
+            display = Quartz.CGMainDisplayID()
+            mode = Quartz.CGDisplayCopyDisplayMode(display)
+            stream = Quartz.CGDisplayStreamCreate(
+                display,
+                Quartz.CGDisplayModeGetPixelWidth(mode),
+                Quartz.CGDisplayModeGetPixelHeight(mode),
+                _BGRA,
+                {Quartz.kCGDisplayStreamMinimumFrameTime: self._min_frame_time},
+                self._on_frame,
+            )
+            if stream is None:
+                return
+            self._runloop = Quartz.CFRunLoopGetCurrent()
+            Quartz.CFRunLoopAddSource(
+                self._runloop,
+                Quartz.CGDisplayStreamGetRunLoopSource(stream),
+                Quartz.kCFRunLoopDefaultMode,
+            )
+            if Quartz.CGDisplayStreamStart(stream) != Quartz.kCGErrorSuccess:
+                return
+            self._stream = stream
+        except Exception:  # noqa: PIE786 - fall back to "always dirty"
             return
-    if _HAS_PYAUTOGUI:
-        pyautogui.click(xs, ys)  # type: ignore[arg-type]
+        finally:
+            ready.set()
+        Quartz.CFRunLoopRun()
+
+    def _on_frame(self, status, display_time, surface, update):
+        if status != Quartz.kCGDisplayStreamFrameStatusFrameComplete or update is None:
+            return
+        rects = Quartz.CGDisplayStreamUpdateGetRects(
+            update, Quartz.kCGDisplayStreamUpdateDirtyRects, None
+        )
+        if isinstance(rects, tuple):  # PyObjC returns (rects, count)
+            rects = rects[0]
+        changed = [
+            (int(r.origin.x), int(r.origin.y),
+             int(r.size.width) + 1, int(r.size.height) + 1)
+            for r in rects or ()
+        ]
+        now = now_ms()
+        with self._lock:
+            for key, regions in self._watch.items():
+                if any(_intersects(c, reg) for c in changed for reg in regions):
+                    self._changed[key] = now
 
 
 # Backwards compatibility for modules still importing old names
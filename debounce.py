@@ -1,16 +1,44 @@
 # debounce.py
 
 import time
-from typing import Dict
+
+def now_ms() -> int:
+    """Monotonic clock in integer milliseconds (immune to wall-clock jumps)."""
+    return time.monotonic_ns() // 1_000_000
+
+def ms(seconds: float) -> int:
+    """Convert an interval in seconds to integer milliseconds."""
+    return int(seconds * 1000)
+
+def _interval(cfg, key: str) -> int:
+    interval = cfg._cooldown_time.get(key)
+    if interval is None:
+        interval = ms(getattr(cfg, f"{key}_interval", 0))
+    return interval
 
 def can_act(cfg, key: str) -> bool:
     """
     Allow an action only once per cooldown interval.
-    Expects cfg._cooldown_time and cfg._cooldown dicts.
+    Expects cfg._cooldown_time (intervals) and cfg._cooldown (last fire
+    time per key), both in milliseconds. The interval is looked up when
+    checked, so cooldown_until() and can_act() always agree on it.
     """
-    now = time.time()
-    interval = cfg._cooldown_time.get(key, getattr(cfg, f"{key}_interval", 0))
-    if now >= cfg._cooldown.get(key, 0):
-        cfg._cooldown[key] = now + interval
+    now = now_ms()
+    last = cfg._cooldown.get(key)
+    if last is None or now - last >= _interval(cfg, key):
+        cfg._cooldown[key] = now
         return True
     return False
+
+def cooldown_until(cfg, key: str) -> int:
+    """now_ms() time from which can_act(cfg, key) will pass again."""
+    last = cfg._cooldown.get(key)
+    return 0 if last is None else last + _interval(cfg, key)
+
+def reset_debounce(cfg, *keys: str):
+    """Forget the last fire of ``keys`` (default: all), e.g. on a state change."""
+    if keys:
+        for key in keys:
+            cfg._cooldown.pop(key, None)
+    else:
+        cfg._cooldown.clear()
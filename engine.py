@@ -3,18 +3,23 @@
 engine.py
 
 Tower Bot Engine v2.17 – pauses all other actions while selecting a perk.
-Uses OpenCV template‐matching (with auto‐resize) only for:
-  • Defence Tab
-  • Claim Gems
-  • New Perk detection & initial tap
-
-All other interactions use OCR or direct‐tap coordinates.
+Fixed buttons are recognised from saved captures, best evidence first:
+  • OpenCV template‐matching (with auto‐resize) for the Defence Tab,
+    Claim Gems and New Perk, when a template PNG exists
+  • a low-res pixel signature for Retry, and for Defence/Claim without
+    a template
+  • OCR when neither was captured
+
+Wave, perk choices and all other interactions use OCR or direct‐tap
+coordinates.
 """
 from __future__ import annotations
+import functools
 import json
 import threading
 import time
 import re
+import zlib
 from dataclasses import dataclass, field
 from enum import Enum
 from pathlib import Path
@@ -22,12 +27,18 @@ from typing import List, Tuple, Dict, Optional
 
 import numpy as np
 import cv2
-from PIL import Image
+try:  # optional: linear-time multi-phrase matching for perk selection
+    import ahocorasick  # type: ignore
+    _HAS_AHOCORASICK = True
+except Exception:  # noqa: PIE786 - broad except ok for optional dep
+    ahocorasick = None
+    _HAS_AHOCORASICK = False
 
 from config import REGION_FILE, DEFAULT_REGIONS, PERK_PRIORITY_DEFAULT
-from adb_utils import ensure_app_running, mac_screencap, mac_tap
-from ocr_utils import ocr_text, region_has_white
-from debounce import can_act
+from adb_utils import (ensure_app_running, mac_screencap_rect_gray, mac_tap,
+                       refresh_scale, DirtyTracker)
+from ocr_utils import DIGITS, ocr_kernel, ocr_text, ocr_stack, region_has_white
+from debounce import can_act, cooldown_until, reset_debounce, now_ms, ms
 
 # ──────────────────────────────────────────────────────────────
 class BotState(Enum):
@@ -88,10 +99,12 @@ class BotConfig:
     # Perk priority list
     perk_priority: List[str] = field(default_factory=lambda: PERK_PRIORITY_DEFAULT.copy())
 
-    # Internal cooldowns
-    _cooldown:      Dict[str,float] = field(default_factory=dict, init=False)
-    _cooldown_time: Dict[str,float] = field(default_factory=lambda: {
-        'retry':2.0, 'def':1.0, 'upg':1.0, 'gems':1.0, 'float':2.0, 'perk':3.0
+    # Internal cooldowns (monotonic ms): last fire per key and the interval.
+    # Keys match TowerBot._next, so the two could later collapse into a
+    # single schedule.
+    _cooldown:      Dict[str,int] = field(default_factory=dict, init=False)
+    _cooldown_time: Dict[str,int] = field(default_factory=lambda: {
+        'retry':2000, 'def':1000, 'upg':1000, 'gems':1000, 'float':2000, 'perk':3000
     }, init=False)
 
 # ──────────────────────────────────────────────────────────────
@@ -113,6 +126,62 @@ for name in ("defence_region","claim_region","new_perk_region"):
     if p.exists():
         TEMPLATES[name] = cv2.imread(str(p), cv2.IMREAD_GRAYSCALE)
 
+# Zero-mean / unit-variance thumbnails of fixed buttons, saved by the GUI next
+# to the template PNGs; a pixel fingerprint used where OCR would run instead.
+# The thumbnail keeps the region's aspect ratio: short side SIG_SHORT, long
+# side up to SIG_LONG, so a wide text strip keeps enough columns to tell
+# words apart (a square 16×16 could not tell "DEFENSE" from "ATTACK").
+SIG_SHORT   = 16
+SIG_LONG    = 128
+SIG_MSE_MAX = 0.4   # MSE of two normalised thumbs is 2·(1 − NCC) → NCC ≥ 0.8
+
+def signature_size(w: int, h: int) -> Tuple[int,int]:
+    """(width, height) of the signature thumbnail for a w×h region."""
+    if w >= h:
+        return min(max(round(SIG_SHORT * w / h), SIG_SHORT), SIG_LONG), SIG_SHORT
+    return SIG_SHORT, min(max(round(SIG_SHORT * h / w), SIG_SHORT), SIG_LONG)
+
+def region_signature(sub: np.ndarray, size: Optional[Tuple[int,int]] = None) -> Optional[np.ndarray]:
+    """Normalised thumbnail of a grayscale crop at ``size`` (w, h); None if empty."""
+    if sub.size == 0:
+        return None
+    if size is None:
+        size = signature_size(sub.shape[1], sub.shape[0])
+    thumb = cv2.resize(sub, size, interpolation=cv2.INTER_AREA).astype(np.float32)
+    mean, std = cv2.meanStdDev(thumb)
+    return (thumb - mean[0,0]) / max(std[0,0], 1.0)
+
+SIGNATURES: Dict[str, np.ndarray] = {}
+for name in ("retry1_region","retry2_region","defence_region","claim_region"):
+    p = TEMPLATE_DIR / f"{name}.sig.npy"
+    if p.exists():
+        SIGNATURES[name] = np.load(p)
+
+def sig_distance(sub: np.ndarray, name: str) -> float:
+    """MSE between ``sub``'s signature and SIGNATURES[name] (lower = closer)."""
+    saved = SIGNATURES[name]
+    sig = region_signature(sub, (saved.shape[1], saved.shape[0]))
+    if sig is None:
+        return float("inf")
+    return float(np.mean((sig - saved) ** 2))
+
+# Templates resized to each region's (w, h), keyed by (name, w, h)
+_TPL_CACHE: Dict[Tuple[str,int,int], np.ndarray] = {}
+cv2.setUseOptimized(True)
+
+def template_for(name: str, w: int, h: int) -> Optional[np.ndarray]:
+    """Return TEMPLATES[name] resized to (w, h); resized once per size."""
+    key = (name, w, h)
+    tpl = _TPL_CACHE.get(key)
+    if tpl is None:
+        tpl = TEMPLATES.get(name)
+        if tpl is None:
+            return None
+        if tpl.shape[:2] != (h, w):
+            tpl = cv2.resize(tpl, (w, h), interpolation=cv2.INTER_AREA)
+        _TPL_CACHE[key] = tpl
+    return tpl
+
 def cv_match(sub: np.ndarray, tpl: np.ndarray) -> float:
     """Resize tpl to sub’s size if needed, then return max NCC score."""
     h_sub, w_sub = sub.shape[:2]
@@ -124,22 +193,218 @@ def cv_match(sub: np.ndarray, tpl: np.ndarray) -> float:
     res = cv2.matchTemplate(sub, tpl, cv2.TM_CCOEFF_NORMED)
     return float(res.max())
 
+# Template matches run on a 2× downsampled pair first; only scores at or above
+# this gate are recomputed at full resolution against the 0.7 threshold
+HALF_RES_GATE = 0.6
+
+def cv_score(sub: np.ndarray, name: str) -> float:
+    """
+    NCC score of region ``sub`` against template ``name``, coarse-to-fine:
+    the common no-hit case only touches a quarter of the pixels.
+    """
+    h, w = sub.shape[:2]
+    hw, hh = w // 2, h // 2
+    if hw and hh:
+        sub_half = cv2.resize(sub, (hw, hh), interpolation=cv2.INTER_AREA)
+        score = cv_match(sub_half, template_for(name, hw, hh))
+        if score < HALF_RES_GATE:
+            return score
+    return cv_match(sub, template_for(name, w, h))
+
+# ──────────────────────────────────────────────────────────────
+@functools.lru_cache(maxsize=4)
+def _perk_automaton(priority: Tuple[str,...]):
+    """Aho–Corasick automaton over the perk phrases, valued by rank."""
+    ac = ahocorasick.Automaton()
+    for rank, phrase in enumerate(priority):
+        if phrase and not ac.exists(phrase):
+            ac.add_word(phrase, rank)
+    ac.make_automaton()
+    return ac
+
+def best_perk_rank(text: str, priority: Tuple[str,...]) -> Optional[int]:
+    """
+    Index of the highest-priority phrase found in ``text``, or None.
+    One automaton sweep per text; it is rebuilt whenever the list changes.
+    """
+    if _HAS_AHOCORASICK and any(priority):
+        return min((rank for _, rank in _perk_automaton(priority).iter(text)),
+                   default=None)
+    return next((i for i, p in enumerate(priority) if p in text), None)
+
+# ──────────────────────────────────────────────────────────────
+# OCR text matchers, compiled once instead of lowering/scanning per tick
+_WAVE_RE    = re.compile(r"\d+")
+_RETRY_RE   = re.compile(r"retry", re.IGNORECASE)
+_DEF_RE     = re.compile(r"defen[cs]e", re.IGNORECASE)
+_UPGRADE_RE = re.compile(r"upgrade", re.IGNORECASE)
+_CLAIM_RE   = re.compile(r"claim", re.IGNORECASE)
+_PERK_RE    = re.compile(r"new perk", re.IGNORECASE)
+
+def parse_wave(txt: str) -> Optional[int]:
+    """Wave number from digit-whitelisted OCR text, or None if unreadable."""
+    txt = txt.strip()
+    # isdecimal, not isdigit: it is exactly what int() accepts ("²" is a digit)
+    if txt.isdecimal():
+        return int(txt)
+    if not txt:
+        return None
+    m = _WAVE_RE.search(txt)
+    return int(m.group()) if m else None
+
+# ──────────────────────────────────────────────────────────────
+# Capture pacing (ms): producer cadence while work is due, oldest frame the
+# loop will act on, and how long a tap is given to show up on screen
+FRAME_INTERVAL_MS = 100
+FRAME_MAX_AGE_MS  = 200
+TAP_SETTLE_MS     = 100
+
+@dataclass
+class Frame:
+    """
+    Capture of the bounding box around the regions needed this tick.
+    Only luma is kept (no consumer needs colour), and every consumer reads
+    slice views of it; nothing is re-cropped.
+    """
+    origin: Tuple[int,int]
+    gray:   np.ndarray   # HxW uint8
+    t:      int = 0   # now_ms() when the capture started
+
+    def local(self, region: Tuple[int,int,int,int]) -> Tuple[int,int,int,int]:
+        """Translate a screen region into this frame's coordinates."""
+        x,y,w,h = region
+        return (x - self.origin[0], y - self.origin[1], w, h)
+
+    def gray_sub(self, region: Tuple[int,int,int,int]) -> np.ndarray:
+        x,y,w,h = self.local(region)
+        return self.gray[y:y+h, x:x+w]
+
+    def covers(self, region: Tuple[int,int,int,int]) -> bool:
+        x,y,w,h = self.local(region)
+        return x >= 0 and y >= 0 and x+w <= self.gray.shape[1] and y+h <= self.gray.shape[0]
+
+    def digest(self, regions: List[Tuple[int,int,int,int]]) -> int:
+        """CRC32 over the gray pixels of ``regions`` (cheap change check)."""
+        crc = 0
+        for r in regions:
+            crc = zlib.crc32(np.ascontiguousarray(self.gray_sub(r)), crc)
+        return crc
+
+def capture_regions(regions: List[Tuple[int,int,int,int]]) -> Frame:
+    """Grab only the union bounding box of ``regions`` from the screen."""
+    x0 = min(r[0] for r in regions)
+    y0 = min(r[1] for r in regions)
+    x1 = max(r[0] + r[2] for r in regions)
+    y1 = max(r[1] + r[3] for r in regions)
+    t    = now_ms()
+    gray = mac_screencap_rect_gray(x0, y0, x1 - x0, y1 - y0)
+    return Frame((x0, y0), gray, t)
+
+# Interval field behind each schedule key in TowerBot._next
+INTERVAL_ATTR: Dict[str,str] = {
+    'retry': 'retry_interval', 'def': 'defence_interval', 'upg': 'upgrade_interval',
+    'gems': 'gems_interval', 'wave': 'wave_interval', 'float': 'float_interval',
+    'perk': 'perk_interval',
+}
+
+# Sections whose whole body is gated by can_act(); while on cooldown they
+# look at nothing, so their check must not count as done
+COOLDOWN_GATED = frozenset({'retry', 'upg', 'gems', 'float', 'perk'})
+
+# Feature toggles that decide which loop sections exist at all
+FEATURE_FLAGS: Tuple[str,...] = (
+    'retry_enabled', 'health_enabled', 'abs_def_enabled',
+    'float_enabled', 'gems_enabled', 'perk_enabled',
+)
+
+@functools.lru_cache(maxsize=None)
+def make_tick(flags: Tuple[bool,...]):
+    """
+    Compile a loop body holding only the sections enabled in ``flags``
+    (ordered like FEATURE_FLAGS), so the hot loop never re-tests toggles.
+    Returns ``tick(bot, now, frame)``; cached per flag combination.
+    """
+    on = dict(zip(FEATURE_FLAGS, flags))
+    lines = ["def tick(self, now, frame):",
+             "    self._wave(now, frame)"]
+    if on['retry_enabled']:
+        lines.append("    self._retry(now, frame)")
+    lines.append("    self._defence(now, frame)")
+    if on['health_enabled'] or on['abs_def_enabled']:
+        lines.append("    if self._upg_due(now):")
+        if on['health_enabled']:
+            lines.append("        self._health(frame)")
+        if on['abs_def_enabled']:
+            lines.append("        self._abs_def(frame)")
+    if on['float_enabled']:
+        lines.append("    self._float(now)")
+    if on['gems_enabled']:
+        lines.append("    self._gems(now, frame)")
+    if on['perk_enabled']:
+        lines.append("    self._new_perk(now, frame)")
+    ns: Dict[str, object] = {}
+    exec(compile("\n".join(lines) + "\n", f"<tick {flags}>", "exec"), ns)
+    return ns['tick']
+
 # ──────────────────────────────────────────────────────────────
 class TowerBot:
     def __init__(self, cfg: BotConfig):
         self.cfg    = cfg
         self._stop  = threading.Event()
         self._thr: Optional[threading.Thread] = None
-        now = time.perf_counter()
-        self._next = {k: now for k in ['retry','def','upg','gems','wave','float','perk']}
+        now = now_ms()
+        self._next: Dict[str,int] = {k: now for k in ['retry','def','upg','gems','wave','float','perk']}
+        # Newest frame from the capture thread. Frames are never mutated once
+        # published, so swapping this one reference (atomic in CPython) is
+        # the whole hand-off: a reader keeps whichever frame it picked up
+        self._latest: Optional[Frame] = None
+        self._tapped_at = 0
+        self._cap_thr: Optional[threading.Thread] = None
+        # Display-stream change tracking; _checked holds the capture time of
+        # the frame each section last evaluated
+        self._dirty = DirtyTracker()
+        self._checked: Dict[str,int] = {}
+        # Without a display stream: pixel digest of each section's regions
+        # when it was last checked, so identical crops skip their OCR
+        self._digest: Dict[str,int] = {}
+        # CRC of the wave digits last OCR'd; taps don't touch the counter,
+        # so unlike _digest this survives _invalidate()
+        self._wave_crc: Optional[int] = None
+        # Derived from the toggles / regions and rebuilt by _apply_features()
+        # when they change, so the per-tick path builds no dicts: the
+        # specialised loop body, enabled sections → regions, and the enabled
+        # sections that are also gated by a cooldown
+        self._tick = None
+        self._sections: Dict[str, List[Tuple[int,int,int,int]]] = {}
+        self._gated: Tuple[str,...] = ()
+        self._flags_dirty = True
 
     def _dbg(self, *msgs):
         if self.cfg.debug_enabled:
             print("[DEBUG]", *msgs)
 
+    def refresh_features(self):
+        """Call after changing a *_enabled toggle or a region so the loop is rebuilt."""
+        self._flags_dirty = True
+
+    def _apply_features(self):
+        cfg = self.cfg
+        self._flags_dirty = False
+        self._tick = make_tick(tuple(getattr(cfg, f) for f in FEATURE_FLAGS))
+        self._sections = self._section_regions()
+        self._gated = tuple(k for k, on in (
+            ('retry', cfg.retry_enabled),
+            ('upg',   cfg.health_enabled or cfg.abs_def_enabled),
+            ('gems',  cfg.gems_enabled),
+            ('float', cfg.float_enabled),
+            ('perk',  cfg.perk_enabled),
+        ) if on)
+        self._dirty.watch(self._section_regions(enabled_only=False))
+
     def start(self):
         if self._thr and self._thr.is_alive(): return
         self._stop.clear()
+        self._flags_dirty = True
         self._thr = threading.Thread(target=self._loop, daemon=True)
         self._thr.start()
 
@@ -148,36 +413,135 @@ class TowerBot:
             self._stop.set()
             self._thr.join()
 
-    def _handle_perk_selection(self, img: Image.Image, gray: np.ndarray):
+    def _ms_until_due(self, now: int) -> int:
+        """
+        Milliseconds until the earliest enabled section may run.
+        Sections also gated by can_act() are not due before their cooldown.
+        """
+        nxt = self._next
+        due = min(nxt['wave'], nxt['def'])
+        for key in self._gated:
+            due = min(due, max(nxt[key], cooldown_until(self.cfg, key)))
+        return max(0, due - now)
+
+    def _section_regions(self, enabled_only: bool = True) -> Dict[str, List[Tuple[int,int,int,int]]]:
+        """Screen regions read by each (enabled) loop section."""
+        cfg = self.cfg
+        sections = {'wave': [cfg.wave_region], 'def': [cfg.defence_region]}
+        if cfg.retry_enabled or not enabled_only:
+            sections['retry'] = [cfg.retry1_region, cfg.retry2_region]
+        upg = [reg for on, reg in ((cfg.health_enabled, cfg.health_region),
+                                   (cfg.abs_def_enabled, cfg.abs_def_region))
+               if on or not enabled_only]
+        if upg:
+            sections['upg'] = upg
+        if cfg.gems_enabled or not enabled_only:
+            sections['gems'] = [cfg.claim_region]
+        if cfg.perk_enabled or not enabled_only:
+            sections['perk'] = [cfg.new_perk_region]
+        return sections
+
+    def _due_sections(self, now: int) -> Dict[str, List[Tuple[int,int,int,int]]]:
+        """
+        Sections due at ``now`` whose regions changed since they were last
+        checked (always true without a display stream).
+        """
+        return {k: regs for k, regs in self._sections.items()
+                if now >= self._next[k]
+                and self._dirty.changed_at(k) >= self._checked.get(k, -1)}
+
+    def _perk_regions(self) -> List[Tuple[int,int,int,int]]:
+        return [self.cfg.perk1_region, self.cfg.perk2_region,
+                self.cfg.perk3_region, self.cfg.perk4_region]
+
+    def _tap(self, x: int, y: int):
+        """mac_tap() that also marks earlier frames and checks as stale."""
+        mac_tap(x, y)
+        self._tapped_at = now_ms()
+        self._invalidate()
+
+    def _invalidate(self, *keys: str):
+        """Force sections (default: all) to be re-checked on their next turn."""
+        self._dirty.mark(*keys)
+        if keys:
+            for key in keys:
+                self._digest.pop(key, None)
+        else:
+            self._digest.clear()
+
+    def _capture_loop(self):
+        """
+        Producer: keep a fresh frame of the soon-due regions in the spare
+        slot, so _loop never waits on the screenshot itself.
         """
-        OCR each of perk1_region, perk2_region, perk3_region, perk4_region,
+        while not self._stop.is_set():
+            now = now_ms()
+            # A grab before the last tap has settled would be discarded
+            settle = self._tapped_at + TAP_SETTLE_MS
+            if now < settle:
+                self._stop.wait((settle - now) / 1000)
+                continue
+            if self.cfg.state == BotState.PERK_SELECTING:
+                regions = self._perk_regions()
+            else:
+                wait = self._ms_until_due(now) - FRAME_INTERVAL_MS
+                if wait > 0:
+                    self._stop.wait(min(wait, 500) / 1000)
+                    continue
+                regions = [r for regs in self._due_sections(now + FRAME_INTERVAL_MS).values()
+                           for r in regs]
+            if regions:
+                self._latest = capture_regions(regions)
+            self._stop.wait(FRAME_INTERVAL_MS / 1000)
+
+    def _fresh_frame(self, regions: List[Tuple[int,int,int,int]]) -> Frame:
+        """
+        Newest producer frame if it covers ``regions``, is recent and was
+        taken after the last tap settled; otherwise capture synchronously.
+        """
+        settle = self._tapped_at + TAP_SETTLE_MS
+        now = now_ms()
+        if now < settle:
+            time.sleep((settle - now) / 1000)
+            now = now_ms()
+        frame = self._latest
+        if ( frame is None
+          or frame.t < settle
+          or now - frame.t > FRAME_MAX_AGE_MS
+          or not all(frame.covers(r) for r in regions) ):
+            frame = capture_regions(regions)
+        return frame
+
+    def _handle_perk_selection(self, frame: Frame):
+        """
+        OCR perk1_region..perk4_region in one batched Tesseract call,
         match against perk_priority, tap the highest-priority perk,
         then clear state to IDLE.
         """
+        regs = (self.cfg.perk1_region, self.cfg.perk2_region,
+                self.cfg.perk3_region, self.cfg.perk4_region)
+        texts, dt = ocr_stack(frame.gray, [frame.local(r) for r in regs])
+        self._dbg(f"PERK OCR ({dt:.1f}ms)")
         text_regions = []
-        for idx, reg in enumerate((self.cfg.perk1_region,
-                                   self.cfg.perk2_region,
-                                   self.cfg.perk3_region,
-                                   self.cfg.perk4_region), start=1):
-            txt, dt = ocr_text(img, reg)
-            low = txt.lower()
-            self._dbg(f"PERK OCR R{idx}: '{low.strip()}' ({dt:.1f}ms)")
+        for idx, (low, reg) in enumerate(zip(texts, regs), start=1):
+            self._dbg(f"PERK OCR R{idx}: '{low}'")
             text_regions.append((idx, low, reg))
 
-        chosen = None
-        for priority in self.cfg.perk_priority:
-            for idx, low, reg in text_regions:
-                if priority in low:
-                    chosen = (priority, idx, reg)
-                    break
-            if chosen:
-                break
+        prio = tuple(self.cfg.perk_priority)
+        best = None
+        for idx, low, reg in text_regions:
+            rank = best_perk_rank(low, prio)
+            if rank is not None and (best is None or rank < best[0]):
+                best = (rank, idx, reg)
 
-        if chosen:
-            priority, idx, (x,y,w,h) = chosen
+        if best:
+            rank, idx, (x,y,w,h) = best
+            priority = prio[rank]
             cx, cy = x + w//2, y + h//2
             self._dbg(f"Selected perk '{priority}' in region {idx} → tapping", (cx, cy))
-            mac_tap(cx, cy)
+            self._tap(cx, cy)
+            # Perk taken → another pending "New Perk" may open right away
+            reset_debounce(self.cfg, 'perk')
         else:
             self._dbg("No matching perk found")
 
@@ -186,145 +550,225 @@ class TowerBot:
 
     def _loop(self):
         load_regions(self.cfg)
+        # Cooldowns from a previous run don't carry over
+        reset_debounce(self.cfg)
+        # Pre-warm the resized-template cache for the loaded regions
+        for name in TEMPLATES:
+            _, _, w, h = getattr(self.cfg, name)
+            template_for(name, w, h)
+            template_for(name, w // 2, h // 2)
+        # …and the size-specialised OCR preprocessors
+        for name in ("wave_region", "retry1_region", "retry2_region", "defence_region",
+                     "claim_region", "new_perk_region", "perk1_region", "perk2_region",
+                     "perk3_region", "perk4_region"):
+            _, _, w, h = getattr(self.cfg, name)
+            ocr_kernel(w, h)
         if not ensure_app_running():
             self._dbg("Warning: 'The Tower' process not found; continuing anyway")
+        self._dbg(f"Screen scale: {refresh_scale():.2f}")
+        self._apply_features()
+        self._checked.clear()
+        self._digest.clear()
+        self._wave_crc = None
+        self._dbg(f"Display stream: {self._dirty.start()}")
+        self._cap_thr = threading.Thread(target=self._capture_loop, daemon=True)
+        self._cap_thr.start()
+        try:
+            self._run()
+        finally:
+            self._stop.set()
+            self._cap_thr.join()
+            self._dirty.stop()
 
+    def _run(self):
         while not self._stop.is_set():
-            now  = time.perf_counter()
-            img  = mac_screencap()
-            gray = cv2.cvtColor(np.array(img), cv2.COLOR_BGR2GRAY)
+            now  = now_ms()
+            if self._flags_dirty:
+                self._apply_features()
 
             # If in PERK_SELECTING state, only run perk handler
             if self.cfg.state == BotState.PERK_SELECTING:
+                frame = self._fresh_frame(self._perk_regions())
                 self._dbg("PERK_SELECTING → running handler")
-                self._handle_perk_selection(img, gray)
+                self._handle_perk_selection(frame)
                 time.sleep(0.1)
                 continue
 
-            # 1) Wave OCR
-            if now >= self._next['wave']:
-                self._next['wave'] = now + self.cfg.wave_interval
-                txt, dt = ocr_text(img, self.cfg.wave_region, whitelist="0123456789")
-                m = re.search(r"\b(\d+)\b", txt)
-                if m:
-                    self.cfg.wave_number = int(m.group(1))
-                    self._dbg(f"Wave {self.cfg.wave_number} ({dt:.1f} ms)")
-
-            # 2) Retry OCR
-            if ( self.cfg.retry_enabled
-              and now >= self._next['retry']
-              and can_act(self.cfg,'retry') ):
-                self._next['retry'] = now + self.cfg.retry_interval
-                for region in (self.cfg.retry1_region, self.cfg.retry2_region):
-                    txt, _ = ocr_text(img, region)
-                    if "retry" in txt.lower():
-                        x,y,w,h = region
-                        cx,cy = x+w//2, y+h//2
-                        self._dbg("Retry → tapping", (cx,cy))
-                        mac_tap(cx, cy)
-                        break
-
-            # 3) Defence Tab (CV + OCR fallback)
-            if now >= self._next['def']:
-                self._next['def'] = now + self.cfg.defence_interval
-                tpl = TEMPLATES.get("defence_region")
-                active = False
-                if tpl is not None:
-                    x,y,w,h = self.cfg.defence_region
-                    sub = gray[y:y+h, x:x+w]
-                    score = cv_match(sub, tpl)
-                    active = (score >= 0.7)
-                    self._dbg(f"DefTab CV score: {score:.2f}")
-                else:
-                    txt, _ = ocr_text(img, self.cfg.defence_region)
-                    low = txt.lower()
-                    active = (("defense" in low or "defence" in low) and "upgrade" in low)
-                    self._dbg(f"DefTab OCR: '{txt.strip()}'")
-
-                if not active and can_act(self.cfg,'def'):
-                    xt,yt = self.cfg.def_tab_tap_coord
-                    self._dbg("DefTab inactive → tapping", (xt,yt))
-                    mac_tap(xt, yt)
-                else:
-                    self._dbg("DefTab active, skipping tap")
-
-            # 4) Health & AbsDef upgrades (white-pixel OCR)
-            if now >= self._next['upg'] and can_act(self.cfg,'upg'):
-                self._next['upg'] = now + self.cfg.upgrade_interval
+            # Nothing due yet → sleep until the earliest deadline instead of
+            # paying for a screenshot nobody will look at
+            wait = self._ms_until_due(now)
+            if wait > 0:
+                time.sleep(min(wait, 500) / 1000)
+                continue
 
-                if ( self.cfg.health_enabled
-                  and self.cfg.wave_number < self.cfg.health_stop
-                  and region_has_white(img, self.cfg.health_region) ):
-                    x,y,w,h = self.cfg.health_region
+            # Due sections whose regions haven't changed since their last
+            # check would see the same pixels → push them to the next interval
+            due = self._due_sections(now)
+            skip = [k for k in self._sections if now >= self._next[k] and k not in due]
+
+            # Only the regions of the remaining due sections are needed
+            regions = [r for regs in due.values() for r in regs]
+            frame = self._fresh_frame(regions) if regions else None
+            for key, regs in due.items():
+                if key in COOLDOWN_GATED and now < cooldown_until(self.cfg, key):
+                    continue
+                if not self._dirty.active:
+                    # No change events → compare the crops themselves
+                    digest = frame.digest(regs)
+                    if self._digest.get(key) == digest:
+                        skip.append(key)
+                        continue
+                    self._digest[key] = digest
+                self._checked[key] = frame.t
+
+            for key in skip:
+                self._next[key] = now + ms(getattr(self.cfg, INTERVAL_ATTR[key]))
+
+            self._tick(self, now, frame)
+
+    # ── Loop sections (stitched together by make_tick) ───────────
+    def _wave(self, now: int, frame: Frame):
+        """1) Wave OCR"""
+        if now >= self._next['wave']:
+            self._next['wave'] = now + ms(self.cfg.wave_interval)
+            crc = frame.digest([self.cfg.wave_region])
+            if crc == self._wave_crc:
+                return
+            self._wave_crc = crc
+            txt, dt = ocr_text(frame.gray, frame.local(self.cfg.wave_region), whitelist=DIGITS)
+            wave = parse_wave(txt)
+            if wave is not None:
+                self.cfg.wave_number = wave
+                self._dbg(f"Wave {self.cfg.wave_number} ({dt:.1f} ms)")
+
+    def _retry(self, now: int, frame: Frame):
+        """2) Retry (signature + OCR fallback)"""
+        if now >= self._next['retry'] and can_act(self.cfg,'retry'):
+            self._next['retry'] = now + ms(self.cfg.retry_interval)
+            for name in ("retry1_region", "retry2_region"):
+                region = getattr(self.cfg, name)
+                if name in SIGNATURES:
+                    dist = sig_distance(frame.gray_sub(region), name)
+                    self._dbg(f"Retry sig distance: {dist:.2f}")
+                    found = dist <= SIG_MSE_MAX
+                else:
+                    txt, _ = ocr_text(frame.gray, frame.local(region))
+                    found = bool(_RETRY_RE.search(txt))
+                if found:
+                    x,y,w,h = region
                     cx,cy = x+w//2, y+h//2
-                    self._dbg("Health → tapping", (cx,cy))
-                    mac_tap(cx, cy)
+                    self._dbg("Retry → tapping", (cx,cy))
+                    self._tap(cx, cy)
+                    break
 
-                if ( self.cfg.abs_def_enabled
-                  and self.cfg.wave_number < self.cfg.abs_def_stop
-                  and region_has_white(img, self.cfg.abs_def_region) ):
-                    x,y,w,h = self.cfg.abs_def_region
+    def _defence(self, now: int, frame: Frame):
+        """3) Defence Tab (CV, then signature, then OCR fallback)"""
+        if now >= self._next['def']:
+            self._next['def'] = now + ms(self.cfg.defence_interval)
+            active = False
+            sub = frame.gray_sub(self.cfg.defence_region)
+            if "defence_region" in TEMPLATES:
+                score = cv_score(sub, "defence_region")
+                active = (score >= 0.7)
+                self._dbg(f"DefTab CV score: {score:.2f}")
+            elif "defence_region" in SIGNATURES:
+                dist = sig_distance(sub, "defence_region")
+                active = (dist <= SIG_MSE_MAX)
+                self._dbg(f"DefTab sig distance: {dist:.2f}")
+            else:
+                txt, _ = ocr_text(frame.gray, frame.local(self.cfg.defence_region))
+                active = bool(_DEF_RE.search(txt) and _UPGRADE_RE.search(txt))
+                self._dbg(f"DefTab OCR: '{txt.strip()}'")
+
+            if not active and can_act(self.cfg,'def'):
+                xt,yt = self.cfg.def_tab_tap_coord
+                self._dbg("DefTab inactive → tapping", (xt,yt))
+                self._tap(xt, yt)
+            elif not active:
+                # Still inactive but on cooldown → recheck even if unchanged
+                self._invalidate('def')
+            else:
+                self._dbg("DefTab active, skipping tap")
+
+    def _upg_due(self, now: int) -> bool:
+        """4) Health & AbsDef upgrades (white-pixel check) – shared gate"""
+        if now >= self._next['upg'] and can_act(self.cfg,'upg'):
+            self._next['upg'] = now + ms(self.cfg.upgrade_interval)
+            return True
+        return False
+
+    def _health(self, frame: Frame):
+        if ( self.cfg.wave_number < self.cfg.health_stop
+          and region_has_white(frame.gray, frame.local(self.cfg.health_region)) ):
+            x,y,w,h = self.cfg.health_region
+            cx,cy = x+w//2, y+h//2
+            self._dbg("Health → tapping", (cx,cy))
+            self._tap(cx, cy)
+
+    def _abs_def(self, frame: Frame):
+        if ( self.cfg.wave_number < self.cfg.abs_def_stop
+          and region_has_white(frame.gray, frame.local(self.cfg.abs_def_region)) ):
+            x,y,w,h = self.cfg.abs_def_region
+            cx,cy = x+w//2, y+h//2
+            self._dbg("AbsDef → tapping", (cx,cy))
+            self._tap(cx, cy)
+
+    def _float(self, now: int):
+        """5) Float Gem tap"""
+        if now >= self._next['float'] and can_act(self.cfg,'float'):
+            self._next['float'] = now + ms(self.cfg.float_interval)
+            x,y = self.cfg.float_gem_coord
+            self._dbg("FloatGem → tapping", (x,y))
+            self._tap(x, y)
+
+    def _gems(self, now: int, frame: Frame):
+        """6) Claim Gems (CV, then signature, then OCR fallback)"""
+        if now >= self._next['gems'] and can_act(self.cfg,'gems'):
+            self._next['gems'] = now + ms(self.cfg.gems_interval)
+            x,y,w,h = self.cfg.claim_region
+            sub = frame.gray_sub(self.cfg.claim_region)
+
+            if "claim_region" in TEMPLATES:
+                score = cv_score(sub, "claim_region")
+                self._dbg(f"Claim CV score: {score:.2f}")
+                if score >= 0.7:
                     cx,cy = x+w//2, y+h//2
-                    self._dbg("AbsDef → tapping", (cx,cy))
-                    mac_tap(cx, cy)
-
-            # 5) Float Gem tap
-            if ( self.cfg.float_enabled
-              and now >= self._next['float']
-              and can_act(self.cfg,'float') ):
-                self._next['float'] = now + self.cfg.float_interval
-                x,y = self.cfg.float_gem_coord
-                self._dbg("FloatGem → tapping", (x,y))
-                mac_tap(x, y)
-
-            # 6) Claim Gems (CV + OCR fallback)
-            if ( self.cfg.gems_enabled
-              and now >= self._next['gems']
-              and can_act(self.cfg,'gems') ):
-                self._next['gems'] = now + self.cfg.gems_interval
-                tpl = TEMPLATES.get("claim_region")
-                x,y,w,h = self.cfg.claim_region
-                sub = gray[y:y+h, x:x+w]
-
-                if tpl is not None:
-                    score = cv_match(sub, tpl)
-                    self._dbg(f"Claim CV score: {score:.2f}")
-                    if score >= 0.7:
-                        cx,cy = x+w//2, y+h//2
-                        self._dbg("Claim → tapping", (cx,cy))
-                        mac_tap(cx, cy)
-                else:
-                    txt,_ = ocr_text(img, self.cfg.claim_region)
-                    if "claim" in txt.lower():
-                        cx,cy = x+w//2, y+h//2
-                        self._dbg("Claim OCR → tapping", (cx,cy))
-                        mac_tap(cx, cy)
-
-            # 7) New Perk detection (CV + OCR fallback)
-            if ( self.cfg.perk_enabled
-              and now >= self._next['perk']
-              and can_act(self.cfg,'perk') ):
-                self._next['perk'] = now + self.cfg.perk_interval
-                tpl = TEMPLATES.get("new_perk_region")
-                x,y,w,h = self.cfg.new_perk_region
-                sub = gray[y:y+h, x:x+w]
-                triggered = False
-
-                if tpl is not None:
-                    score = cv_match(sub, tpl)
-                    triggered = (score >= 0.7)
-                    self._dbg(f"NewPerk CV score: {score:.2f}")
-                else:
-                    txt,_ = ocr_text(img, self.cfg.new_perk_region)
-                    triggered = ("new perk" in txt.lower())
-                    self._dbg(f"NewPerk OCR: '{txt.strip()}'")
-
-                if triggered:
+                    self._dbg("Claim → tapping", (cx,cy))
+                    self._tap(cx, cy)
+            elif "claim_region" in SIGNATURES:
+                dist = sig_distance(sub, "claim_region")
+                self._dbg(f"Claim sig distance: {dist:.2f}")
+                if dist <= SIG_MSE_MAX:
                     cx,cy = x+w//2, y+h//2
-                    self._dbg("NEW PERK → tapping centre to open menu", (cx,cy))
-                    mac_tap(cx, cy)
-                    self._dbg("Switching to PERK_SELECTING state")
-                    self.cfg.state = BotState.PERK_SELECTING
-
-            # sleep a short while to limit CPU usage
-            time.sleep(0.1)
+                    self._dbg("Claim → tapping", (cx,cy))
+                    self._tap(cx, cy)
+            else:
+                txt,_ = ocr_text(frame.gray, frame.local(self.cfg.claim_region))
+                if _CLAIM_RE.search(txt):
+                    cx,cy = x+w//2, y+h//2
+                    self._dbg("Claim OCR → tapping", (cx,cy))
+                    self._tap(cx, cy)
+
+    def _new_perk(self, now: int, frame: Frame):
+        """7) New Perk detection (CV + OCR fallback)"""
+        if now >= self._next['perk'] and can_act(self.cfg,'perk'):
+            self._next['perk'] = now + ms(self.cfg.perk_interval)
+            x,y,w,h = self.cfg.new_perk_region
+            sub = frame.gray_sub(self.cfg.new_perk_region)
+            triggered = False
+
+            if "new_perk_region" in TEMPLATES:
+                score = cv_score(sub, "new_perk_region")
+                triggered = (score >= 0.7)
+                self._dbg(f"NewPerk CV score: {score:.2f}")
+            else:
+                txt,_ = ocr_text(frame.gray, frame.local(self.cfg.new_perk_region))
+                triggered = bool(_PERK_RE.search(txt))
+                self._dbg(f"NewPerk OCR: '{txt.strip()}'")
+
+            if triggered:
+                cx,cy = x+w//2, y+h//2
+                self._dbg("NEW PERK → tapping centre to open menu", (cx,cy))
+                self._tap(cx, cy)
+                self._dbg("Switching to PERK_SELECTING state")
+                self.cfg.state = BotState.PERK_SELECTING
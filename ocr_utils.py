@@ -1,46 +1,234 @@
 # ocr_utils.py
 
+import bisect
+import functools
+import shutil
+import threading
 import time
 import pytesseract
 import numpy as np
-from PIL import Image, ImageEnhance
-from typing import Tuple, Optional
+import cv2
+from typing import Callable, Dict, List, Tuple, Optional
+
+# Homebrew's prefix may be missing from PATH when launched from Finder
+TESS_PATH = shutil.which("tesseract") or shutil.which("/opt/homebrew/bin/tesseract")
+if TESS_PATH:
+    pytesseract.pytesseract.tesseract_cmd = TESS_PATH
+
+DIGITS = "0123456789"
+PSM_LINE, PSM_BLOCK = 7, 6
+
+try:  # libtesseract bindings keep the engine + traineddata loaded in-process
+    from tesserocr import PyTessBaseAPI, OEM, RIL, iterate_level  # type: ignore
+    _TESS = PyTessBaseAPI(psm=PSM_LINE, oem=OEM.LSTM_ONLY)
+    _HAS_TESSEROCR = True
+except Exception as e:  # noqa: PIE786 - broad except ok for optional dep
+    _TESS = None
+    _TESSEROCR_ERROR = e
+    _HAS_TESSEROCR = False
+
+# One resident API handle per (psm, whitelist) variant, configured once at
+# creation so calls never mutate Tesseract's settings. Each has its own lock:
+# the GUI and the bot thread may both OCR, and distinct variants can run
+# concurrently.
+_TESS_HANDLES: Dict[Tuple[int,str], Tuple["PyTessBaseAPI", threading.Lock]] = {}
+_TESS_HANDLES_LOCK = threading.Lock()
+
+def _tess_handle(psm: int, whitelist: Optional[str] = None) -> Tuple["PyTessBaseAPI", threading.Lock]:
+    key = (psm, whitelist or "")
+    handle = _TESS_HANDLES.get(key)
+    if handle is None:
+        with _TESS_HANDLES_LOCK:
+            handle = _TESS_HANDLES.get(key)
+            if handle is None:
+                api = PyTessBaseAPI(psm=psm, oem=OEM.LSTM_ONLY)
+                if whitelist:
+                    api.SetVariable("tessedit_char_whitelist", whitelist)
+                handle = _TESS_HANDLES[key] = (api, threading.Lock())
+    return handle
+
+if _HAS_TESSEROCR:
+    # The probe handle is the generic single-line one; build the other
+    # variants the bot uses (wave digits, stacked perk block) up front
+    _TESS_HANDLES[(PSM_LINE, "")] = (_TESS, threading.Lock())
+    _tess_handle(PSM_LINE, DIGITS)
+    _tess_handle(PSM_BLOCK)
+
+try:  # optional JIT for the pixel scans
+    from numba import njit, types as numba_types  # type: ignore
+    _HAS_NUMBA = True
+except Exception as e:  # noqa: PIE786 - broad except ok for optional dep
+    njit = numba_types = None
+    _NUMBA_ERROR = e
+    _HAS_NUMBA = False
+
+if _HAS_NUMBA:
+    # Explicit signature → compiled at import, not on the first tick. A
+    # read-only, any-layout array type accepts strided views (no crop copy)
+    # as well as writable and read-only buffers
+    _GRAY_VIEW = numba_types.Array(numba_types.uint8, 2, 'A', readonly=True)
+
+    @njit(numba_types.boolean(_GRAY_VIEW, numba_types.int64),
+          cache=True, fastmath=True, boundscheck=False)
+    def _any_gt(arr, thr):
+        """True as soon as one pixel of a 2-D array exceeds ``thr``."""
+        h, w = arr.shape
+        for j in range(h):
+            for i in range(w):
+                if arr[j, i] > thr:
+                    return True
+        return False
+else:
+    def _any_gt(arr: np.ndarray, thr: int) -> bool:
+        """True if any pixel of a 2-D array exceeds ``thr`` (one SIMD pass)."""
+        return arr.size > 0 and cv2.minMaxLoc(arr)[1] > thr
+
+def _tess_load(api: "PyTessBaseAPI", bw: np.ndarray):
+    """Load a binarised image into ``api``; the caller holds its lock."""
+    bw = np.ascontiguousarray(bw)
+    h, w = bw.shape
+    # Raw 8-bit buffer: no PIL wrapper / re-encode on the way in
+    api.SetImageBytes(bw.tobytes(), w, h, 1, w)
+
+def _tess_config(psm: int, whitelist: Optional[str] = None) -> str:
+    config = f"--oem 3 --psm {psm}"
+    if whitelist:
+        config += f" -c tessedit_char_whitelist={whitelist}"
+    return config
+
+def _tesseract(bw: np.ndarray, psm: int, whitelist: Optional[str] = None) -> str:
+    """Run Tesseract on a binarised image, in-process when tesserocr is available."""
+    if _HAS_TESSEROCR:
+        api, lock = _tess_handle(psm, whitelist)
+        with lock:
+            _tess_load(api, bw)
+            return api.GetUTF8Text()
+    return pytesseract.image_to_string(bw, config=_tess_config(psm, whitelist))
+
+def _tesseract_words(bw: np.ndarray, psm: int) -> List[Tuple[str,int]]:
+    """Recognised words of a binarised image as (text, centre_y), in reading order."""
+    words: List[Tuple[str,int]] = []
+    if _HAS_TESSEROCR:
+        api, lock = _tess_handle(psm)
+        with lock:
+            _tess_load(api, bw)
+            api.Recognize()
+            it = api.GetIterator()
+            if it is not None:
+                for w in iterate_level(it, RIL.WORD):
+                    text, box = w.GetUTF8Text(RIL.WORD), w.BoundingBox(RIL.WORD)
+                    if text and box:
+                        words.append((text, (box[1] + box[3]) // 2))
+        return words
+    data = pytesseract.image_to_data(bw, config=_tess_config(psm),
+                                     output_type=pytesseract.Output.DICT)
+    for text, top, height in zip(data["text"], data["top"], data["height"]):
+        if text.strip():
+            words.append((text, top + height // 2))
+    return words
+
+# Binarisation of OCR crops: contrast gain about the crop mean, then cut-off
+OCR_CONTRAST  = 1.5
+OCR_THRESHOLD = 160
+
+@functools.lru_cache(maxsize=64)
+def ocr_kernel(w: int, h: int) -> Callable[[np.ndarray], Optional[np.ndarray]]:
+    """
+    Preprocessor specialised for w×h crops: upscale 1.5× and binarise.
+    Regions are fixed once loaded, so the output size is computed here
+    once instead of on every call.
+    """
+    size = (int(w*1.5), int(h*1.5))
+    interp, gain, cut = cv2.INTER_CUBIC, OCR_CONTRAST, OCR_THRESHOLD
+
+    def kernel(sub: np.ndarray) -> Optional[np.ndarray]:
+        if sub.size == 0:
+            return None
+        sub = cv2.resize(sub, size, interpolation=interp)
+        # ×1.5 contrast around the mean followed by ">160" is the same as one
+        # threshold at mean + (160 - mean) / 1.5 → a single pass, no temp image
+        mean = cv2.mean(sub)[0]
+        _, bw = cv2.threshold(sub, mean + (cut - mean) / gain, 255, cv2.THRESH_BINARY)
+        return bw
+    return kernel
+
+def _preprocess(
+    gray: np.ndarray,
+    region: Tuple[int,int,int,int]
+) -> Optional[np.ndarray]:
+    """Crop, upscale 1.5× and binarise a region; None if it is empty."""
+    x,y,w,h = region
+    return ocr_kernel(w, h)(gray[y:y+h, x:x+w])
 
 def ocr_text(
-    img: Image.Image,
+    gray: np.ndarray,
     region: Tuple[int,int,int,int],
     whitelist: Optional[str] = None
 ) -> Tuple[str, float]:
     """
-    Perform OCR on the given region.
+    Perform OCR on the given region of an already-grayscale capture.
     Returns (recognized_text, elapsed_ms).
     """
-    x,y,w,h = region
-    crop = img.crop((x,y,x+w,y+h)).convert("L")
-    crop = crop.resize((int(w*1.5), int(h*1.5)), Image.LANCZOS)
-    crop = ImageEnhance.Contrast(crop).enhance(1.5)
-    crop = ImageEnhance.Sharpness(crop).enhance(1.2)
-    crop = crop.point(lambda p: 255 if p>160 else 0)
-    config = "--oem 3 --psm 7"
-    if whitelist:
-        config += f" -c tessedit_char_whitelist={whitelist}"
+    bw = _preprocess(gray, region)
+    if bw is None:
+        return "", 0.0
     start = time.perf_counter()
     try:
-        txt = pytesseract.image_to_string(crop, config=config)
+        txt = _tesseract(bw, PSM_LINE, whitelist)
     except pytesseract.TesseractNotFoundError:
         # When Tesseract is missing, return empty text to avoid crashes
         return "", 0.0
     elapsed = (time.perf_counter() - start) * 1000
     return txt.replace("\n"," ").lower().strip(), elapsed
 
+def ocr_stack(
+    gray: np.ndarray,
+    regions: List[Tuple[int,int,int,int]]
+) -> Tuple[List[str], float]:
+    """
+    OCR several single-line regions with one Tesseract call.
+    The preprocessed crops are stacked vertically (black separator bars,
+    padded to equal width) and read as a text block; each recognised word
+    goes back to the region whose y-band holds its centre, so blank or
+    wrapped regions can't shift the others.
+    Returns (texts, elapsed_ms).
+    """
+    crops = [_preprocess(gray, r) for r in regions]
+    if any(c is None for c in crops):
+        return [ocr_text(gray, r)[0] for r in regions], 0.0
+    width = max(c.shape[1] for c in crops)
+    sep = np.zeros((8, width), np.uint8)
+    parts, starts, y = [], [], 0
+    for c in crops:
+        if parts:
+            parts.append(sep)
+            y += sep.shape[0]
+        starts.append(y)
+        parts.append(cv2.copyMakeBorder(c, 0, 0, 0, width - c.shape[1],
+                                        cv2.BORDER_CONSTANT, value=0))
+        y += c.shape[0]
+    stacked = np.vstack(parts)
+    start = time.perf_counter()
+    try:
+        words = _tesseract_words(stacked, PSM_BLOCK)
+    except pytesseract.TesseractNotFoundError:
+        return [""] * len(regions), 0.0
+    elapsed = (time.perf_counter() - start) * 1000
+    texts: List[List[str]] = [[] for _ in regions]
+    for text, cy in words:
+        # A separator bar belongs to the crop above it
+        texts[max(bisect.bisect_right(starts, cy) - 1, 0)].append(text)
+    return [" ".join(t).lower().strip() for t in texts], elapsed
+
 def region_has_white(
-    img: Image.Image,
+    gray: np.ndarray,
     region: Tuple[int,int,int,int]
 ) -> bool:
     """
-    Fast white‐pixel detector via NumPy.
-    Returns True if any pixel >250 in the region.
+    Fast white‐pixel detector.
+    Returns True if any pixel >250 in the region of a grayscale frame.
+    Scans a view of the frame (no crop copy) and stops at the first hit
+    with Numba, else a single cv2.minMaxLoc pass.
     """
     x,y,w,h = region
-    arr = np.array(img.crop((x,y,x+w,y+h)).convert("L"))
-    return bool((arr > 250).any())
+    return bool(_any_gt(gray[y:y+h, x:x+w], 250))
@@ -14,14 +14,28 @@ Coords and Setup tabs stay in sync.
 from __future__ import annotations
 import json
 import tkinter as tk
+from concurrent.futures import ThreadPoolExecutor
 from tkinter import ttk, messagebox
 from pathlib import Path
+import numpy as np
 from PIL import Image, ImageTk
 
 from config import REGION_FILE
-from engine import BotConfig, TowerBot, load_regions
+from engine import BotConfig, TowerBot, load_regions, region_signature
 from adb_utils import mac_screencap, ensure_app_running
 
+# Template PNG / signature writes happen here, off the Tk thread
+_IO_POOL = ThreadPoolExecutor(max_workers=2)
+
+
+def _save_template(crop: Image.Image, out: Path):
+    """Write a region template and its .sig.npy fingerprint next to it."""
+    # Only the bot reads these back → fastest zlib level, no optimize pass
+    crop.save(out, "PNG", compress_level=1, optimize=False)
+    sig = region_signature(np.asarray(crop.convert("L")))
+    if sig is not None:
+        np.save(out.with_suffix(".sig.npy"), sig)
+
 
 class TowerBotGUI(tk.Tk):
     def __init__(self, cfg: BotConfig):
@@ -55,7 +69,7 @@ class TowerBotGUI(tk.Tk):
             var = tk.BooleanVar(value=getattr(self.cfg, attr))
             chk = ttk.Checkbutton(
                 main, text=text, variable=var,
-                command=lambda: setattr(self.cfg, attr, var.get())
+                command=lambda: self._set_feature(attr, var.get())
             )
             chk.grid(row=row, column=0, sticky='w', **pad)
             self.vars[attr] = var
@@ -170,17 +184,23 @@ class TowerBotGUI(tk.Tk):
             row=len(btns)+1, column=0, columnspan=2, pady=(20,0)
         )
 
+    def _set_feature(self, attr: str, value: bool):
+        setattr(self.cfg, attr, value)
+        self.bot.refresh_features()
+
     def _move_up(self):
         sel = self.lb.curselection()
         if sel and sel[0] > 0:
             i = sel[0]; v = self.lb.get(i)
             self.lb.delete(i); self.lb.insert(i-1, v); self.lb.select_set(i-1)
+            self.cfg.perk_priority = list(self.lb.get(0, 'end'))
 
     def _move_down(self):
         sel = self.lb.curselection()
         if sel and sel[0] < self.lb.size()-1:
             i = sel[0]; v = self.lb.get(i)
             self.lb.delete(i); self.lb.insert(i+1, v); self.lb.select_set(i+1)
+            self.cfg.perk_priority = list(self.lb.get(0, 'end'))
 
     def _update_coords(self):
         data = {}
@@ -190,6 +210,7 @@ class TowerBotGUI(tk.Tk):
             data[attr] = list(vals)
             if attr in self._setup_labels:
                 self._setup_labels[attr].config(text=str(vals))
+        self.bot.refresh_features()
         with open(REGION_FILE, 'w') as f:
             json.dump(data, f, indent=2)
         messagebox.showinfo("Saved", "regions.json updated")
@@ -236,7 +257,14 @@ class TowerBotGUI(tk.Tk):
         mh = self.winfo_screenheight() - 200
         scale = min(mw/ow, mh/oh, 1.0)
         dw, dh = int(ow*scale), int(oh*scale)
-        img_disp = img_full.resize((dw, dh), Image.LANCZOS)
+        # Preview only: integer box-reduce first, then a cheap bilinear pass
+        # instead of a full-screen LANCZOS filter on every capture window
+        img_disp = img_full
+        if (dw, dh) != img_full.size:
+            img_disp = img_full.resize((dw, dh), Image.BILINEAR, reducing_gap=3.0)
+        if img_disp.mode != "RGB":
+            # Tk gets no alpha channel; convert the small copy, not the grab
+            img_disp = img_disp.convert("RGB")
 
         self._capture_img_full = img_full
         self._capture_scale = scale
@@ -246,6 +274,7 @@ class TowerBotGUI(tk.Tk):
         canvas = tk.Canvas(self._cap_win, width=dw, height=dh)
         canvas.pack()
         photo = ImageTk.PhotoImage(img_disp)
+        del img_disp  # Tk holds its own copy now
         canvas.create_image(0,0, anchor="nw", image=photo)
         canvas.image = photo
         canvas.bind("<Button-1>", self._on_capture_click)
@@ -276,12 +305,14 @@ class TowerBotGUI(tk.Tk):
             tpl_dir = Path(__file__).parent / "templates"
             tpl_dir.mkdir(exist_ok=True)
             out = tpl_dir / f"{self._capture_attr}.png"
-            self._capture_img_full.crop((x0,y0,x1,y1)).save(out)
-            self._dbg(f"Saved template: {out}")
+            fut = _IO_POOL.submit(_save_template, self._capture_img_full.crop((x0,y0,x1,y1)), out)
+            self._poll_template_save(fut, out)
+            self._dbg(f"Saving template: {out}")
         else:
             region = (x0, y0)
 
         setattr(self.cfg, self._capture_attr, region)
+        self.bot.refresh_features()
         if self._capture_attr in self._setup_labels:
             self._setup_labels[self._capture_attr].config(text=str(region))
         for idx, v in enumerate(self.coord_vars[self._capture_attr]):
@@ -291,6 +322,21 @@ class TowerBotGUI(tk.Tk):
         self._capture_attr = None
         self._capture_coords.clear()
 
+    def _poll_template_save(self, fut, out: Path):
+        # Tk is not thread-safe, so poll from the Tk loop rather than
+        # calling back into it from the worker thread
+        if fut.done():
+            self._on_template_saved(fut, out)
+        else:
+            self.after(50, self._poll_template_save, fut, out)
+
+    def _on_template_saved(self, fut, out: Path):
+        err = fut.exception()
+        if err is not None:
+            messagebox.showerror("Template Error", f"Could not save {out}:\n{err}")
+        else:
+            self._dbg(f"Saved template: {out}")
+
     def _dbg(self, *msgs):
         if self.cfg.debug_enabled:
             print("[DEBUG]", *msgs)